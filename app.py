@@ -5,10 +5,18 @@ Handles API endpoints for medicine detection and information retrieval
 """
 
 
+import bisect
+import hashlib
+import json
 import sqlite3
 import os
-from datetime import datetime
-from flask import Flask, render_template, request, jsonify
+import threading
+import time
+from operator import itemgetter
+import mimetypes
+from flask import (
+    Flask, Response, render_template, request, jsonify, send_from_directory
+)
 from flask_cors import CORS
 
 app = Flask(__name__)
@@ -17,37 +25,80 @@ CORS(app)  # Enable CORS for API requests
 # Enable compression for responses (reduces model file transfer size by ~70%)
 try:
     from flask_compress import Compress
-    compress = Compress()
-    compress.init_app(app)
+    # Config must be in place before init_app: Flask-Compress snapshots
+    # COMPRESS_MIMETYPES when it registers
     app.config['COMPRESS_MIMETYPES'] = [
         'text/html',
         'text/css',
         'text/javascript',
         'application/javascript',
         'application/json',
-        'application/octet-stream',  # For .bin model files
+        # Runtime fallback for .bin model files; skipped when a
+        # precompressed .br sibling exists (see the static view
+        # override below)
+        'application/octet-stream',
     ]
     app.config['COMPRESS_LEVEL'] = 6  # Balance between speed and compression (1-9)
     app.config['COMPRESS_MIN_SIZE'] = 500  # Only compress files > 500 bytes
+    compress = Compress()
+    compress.init_app(app)
     print('[Compression] Flask-Compress enabled successfully')
 except ImportError:
     print('[Compression] Flask-Compress not installed. Run: pip install flask-compress')
     print('[Compression] Continuing without compression (model files will be larger)')
     compress = None
 
+# Use orjson for JSON encoding/decoding when available (C-accelerated,
+# several times faster than the stdlib encoder for these payloads)
+try:
+    import orjson
+    from flask.json.provider import DefaultJSONProvider
+
+    class OrjsonProvider(DefaultJSONProvider):
+        """Flask JSON provider backed by orjson"""
+
+        def dumps(self, obj, **kwargs):
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+
+    app.json = OrjsonProvider(app)
+    print('[JSON] orjson encoder enabled')
+except ImportError:
+    orjson = None
+    print('[JSON] orjson not installed. Run: pip install orjson')
+    print('[JSON] Continuing with the default JSON encoder')
+
 # Database configuration
 DATABASE_PATH = os.path.join(app.root_path, 'assets', 'mediweb.db')
 
 # Initialize database with optimizations
 def init_db():
-    """Initialize database with performance optimizations"""
+    """
+    Idempotent database file setup
+
+    WAL journaling is a persistent property of the database file, so
+    the mode switch is skipped when an earlier boot (or the shipped
+    database) already applied it; the index creations are idempotent on
+    their own. Per-connection pragmas (cache size, temp store, busy
+    timeout) are applied in get_db_connection() instead.
+    """
     conn = sqlite3.connect(DATABASE_PATH)
-    # Enable Write-Ahead Logging for better concurrency
-    conn.execute('PRAGMA journal_mode=WAL')
-    # Increase cache size (10MB)
-    conn.execute('PRAGMA cache_size=-10000')
-    # Use memory for temp storage
-    conn.execute('PRAGMA temp_store=MEMORY')
+    # Enable Write-Ahead Logging only on a fresh database file; the
+    # mode persists in the file, so re-issuing it every boot is wasted
+    if conn.execute('PRAGMA journal_mode').fetchone()[0] != 'wal':
+        conn.execute('PRAGMA journal_mode=WAL')
+    # Index lookups by Pill_Label and ID so queries never fall back to
+    # a full-table scan (ID is a plain INTEGER column here, not a rowid
+    # alias, so it needs its own index). IF NOT EXISTS makes these a
+    # single sqlite_master lookup on databases that already have them.
+    conn.execute(
+        'CREATE UNIQUE INDEX IF NOT EXISTS idx_pills_label '
+        'ON pills(Pill_Label)')
+    conn.execute(
+        'CREATE UNIQUE INDEX IF NOT EXISTS idx_pills_id ON pills(ID)')
+    conn.commit()
     conn.close()
 
 # Run database initialization
@@ -82,20 +133,204 @@ CLASS_TO_IMAGE = {
     'unliab-bioflu': 'unliab-bioflu.png'
 }
 
-# In-memory cache for medicine information
-MEDICINE_CACHE = {}
+# In-memory copies of the pills table, loaded once at startup.
+# The table only changes via update_database.py, so all read endpoints
+# can be served from these dicts without touching SQLite.
+PILLS_BY_LABEL = {}
+PILLS_BY_ID = {}
+MEDICINES_LIST = []
+
+# Pre-serialized /api/medicines payload and its ETag (built alongside
+# the cache above, so the endpoint never re-encodes the same JSON)
+MEDICINES_JSON_BYTES = b'[]'
+MEDICINES_ETAG = ''
+
+# YOLO class label fused directly to its medicine info row, and to a
+# pre-assembled /api/predict response template (both rebuilt by
+# load_pills_cache). The hot path copies a template and fills in only
+# the per-request fields instead of constructing the dict from scratch.
+CLASS_TO_MEDICINE_INFO = {}
+CLASS_TO_BASE_RESPONSE = {}
+
+# Thread-local storage for persistent database connections
+# (one connection per worker thread, reused across requests)
+_local = threading.local()
 
 
 def get_db_connection():
-    """Create a database connection"""
-    conn = sqlite3.connect(DATABASE_PATH)
-    conn.row_factory = sqlite3.Row  # Enable column access by name
+    """
+    Return a persistent per-thread database connection
+
+    Opening a fresh connection on every request re-parses the database
+    header and re-applies pragmas each time. Instead, each worker thread
+    opens one connection on first use, applies the performance pragmas
+    once, and reuses it for all subsequent requests. Connections live
+    for the lifetime of the worker process.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is None:
+        conn = sqlite3.connect(DATABASE_PATH, check_same_thread=False)
+        conn.row_factory = sqlite3.Row  # Enable column access by name
+        # Per-connection performance pragmas (applied once per thread)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA cache_size=-10000')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA busy_timeout=5000')
+        _local.conn = conn
     return conn
 
 
+# Age-banded dosage rules, compiled once at import time. Each rule is a
+# pair of (age_edges, messages): age_edges are the exclusive upper
+# bounds of each band sorted ascending, and messages has one extra
+# entry for the open-ended top band. bisect_right over the edges picks
+# the right message, so dispatch is O(log bands) with no per-call
+# string allocation.
+
+# Paracetamol (Biogesic, RiteMed)
+_PARACETAMOL_DOSAGE = (
+    (2, 6, 12, 18, 65),
+    (
+        "⚠️ CONSULT A DOCTOR: For infants under 2 years, "
+        "paracetamol dosage must be determined by a healthcare professional "
+        "based on weight and specific medical condition. Do not self-medicate.",
+
+        "Children 2-5 years: Typically 120-240 mg (liquid formulation recommended). "
+        "Dosage should be based on body weight (10-15 mg/kg every 4-6 hours). "
+        "Maximum 4 doses in 24 hours. Please consult a pediatrician for exact dosing.",
+
+        "Children 6-11 years: Typically 240-480 mg every 4-6 hours. "
+        "For 500mg tablets: ½ to 1 tablet every 4-6 hours. "
+        "Do not exceed 2,400 mg (approximately 5 tablets of 500mg) in 24 hours. "
+        "Consult a healthcare provider if symptoms persist.",
+
+        "Adolescents 12-17 years: 1 to 2 tablets of 500mg every 4-6 hours as needed. "
+        "Maximum dose: 4,000 mg (8 tablets of 500mg) in 24 hours. "
+        "Maintain at least 4 hours between doses. Take with food if stomach upset occurs.",
+
+        "Adults 18-64 years: 1 to 2 tablets of 500mg every 4-6 hours as needed for pain or fever. "
+        "Maximum dose: 4,000 mg (8 tablets of 500mg) in 24 hours. "
+        "Do not take more than recommended. Can be taken with or without food.",
+
+        "Seniors 65+ years: 1 to 2 tablets of 500mg every 4-6 hours. "
+        "Maximum dose: 3,000 mg (6 tablets of 500mg) in 24 hours recommended for elderly. "
+        "Start with lower dose if you have liver or kidney issues. "
+        "Consult your doctor, especially if taking other medications."
+    )
+)
+
+# Ibuprofen + Paracetamol (Alaxan FR)
+_IBUPROFEN_PARACETAMOL_DOSAGE = (
+    (12, 18, 65),
+    (
+        "⚠️ NOT RECOMMENDED for children under 12 years. Consult a physician for appropriate dosage.",
+        "Adolescents 12-17 years: 1 capsule every 6-8 hours as needed. Do not exceed 6 capsules in 24 hours.",
+        "Adults 18-64 years: 1-2 capsules every 6-8 hours as needed. Maximum: 6 capsules in 24 hours. Take with food to reduce stomach irritation.",
+        "Seniors 65+ years: Start with 1 capsule every 6-8 hours. Maximum: 4 capsules in 24 hours. Use with caution if you have kidney issues."
+    )
+)
+
+# Ibuprofen (Advil)
+_IBUPROFEN_DOSAGE = (
+    (12, 18, 65),
+    (
+        "⚠️ NOT RECOMMENDED in this tablet form for children under 12 years. Use pediatric suspension or consult a doctor.",
+        "Adolescents 12-17 years: 1-2 tablets (200 mg each) every 4-6 hours as needed. Maximum: 1,200 mg (6 tablets) in 24 hours.",
+        "Adults 18-64 years: 1-2 tablets (200 mg each) every 4-6 hours as needed. Maximum: 1,200 mg (6 tablets) in 24 hours for OTC use.",
+        "Seniors 65+ years: Start with 1 tablet every 4-6 hours. Use lowest effective dose. Consult doctor if you have heart, kidney, or stomach issues."
+    )
+)
+
+# Cetirizine (antihistamine)
+_CETIRIZINE_DOSAGE = (
+    (12, 65),
+    (
+        "⚠️ Children under 12 years: Dosage must be determined by a healthcare professional based on age and weight.",
+        "Adults & Children 12+ years: 1 tablet (10 mg) once daily. Take with or without food. May cause mild drowsiness.",
+        "Seniors 65+ years: 1 tablet (10 mg) once daily. Use with caution if you have kidney problems; dose adjustment may be needed. Consult your doctor."
+    )
+)
+
+# Sodium Ascorbate / Vitamin C (Fern-C)
+_VITAMIN_C_DOSAGE = (
+    (12, 18, 65),
+    (
+        "Children under 12 years: Consult a pediatrician for appropriate Vitamin C dosage based on age and dietary needs.",
+        "Adolescents 12-17 years: 1 capsule (500 mg) daily. May be increased to 3-4 capsules during illness as advised by healthcare provider.",
+        "Adults 18-64 years: 1 capsule (500 mg) daily for maintenance. May increase to 3-4 capsules during illness or stress. Take with food if stomach upset occurs.",
+        "Seniors 65+ years: 1 capsule (500 mg) daily. Safe for long-term use. Non-acidic formulation is gentle on the stomach."
+    )
+)
+
+# Antacid (Kremil-S)
+_ANTACID_DOSAGE = (
+    (12, 65),
+    (
+        "⚠️ NOT RECOMMENDED for children. Consult a pediatrician for appropriate antacid treatment.",
+        "Adults 12-64 years: Chew 1-2 tablets one hour after each meal and at bedtime. Maximum: 8 tablets per day. Do not use long-term without medical advice.",
+        "Seniors 65+ years: Chew 1 tablet after meals and at bedtime. Use with caution if you have kidney problems. Consult your doctor for long-term use."
+    )
+)
+
+# Loperamide (Diatabs - antidiarrheal)
+_LOPERAMIDE_DOSAGE = (
+    (12, 65),
+    (
+        "⚠️ NOT RECOMMENDED for children under 12 years. Use pediatric formulations or consult a doctor.",
+        "Adults & Children 12+ years: Take 2 capsules initially, then 1 capsule after each loose stool. Maximum: 8 capsules (16 mg) per day. Ensure adequate hydration with ORS.",
+        "Seniors 65+ years: Take 2 capsules initially, then 1 after each loose stool. Maximum: 6 capsules per day. Stop if no improvement after 2 days and consult doctor. Maintain hydration."
+    )
+)
+
+# Multivitamins (Enervon)
+_MULTIVITAMIN_DOSAGE = (
+    (12, 65),
+    (
+        "⚠️ This adult formulation is not recommended for children under 12 years. Use pediatric multivitamin formulations.",
+        "Adults & Adolescents 12+ years: 1 tablet daily with or without food. Best taken at the same time each day for consistent nutrient levels.",
+        "Seniors 65+ years: 1 tablet daily. Safe for long-term use. Consult your doctor if taking other medications to avoid interactions."
+    )
+)
+
+# Phenylephrine combination (Bioflu - flu medication)
+_PHENYLEPHRINE_DOSAGE = (
+    (12, 65),
+    (
+        "⚠️ NOT RECOMMENDED for children under 12 years. Use pediatric Bioflu syrup with appropriate dosing for age/weight.",
+        "Adults & Children 12+ years: 1 tablet every 6 hours. Do NOT exceed 4 tablets in 24 hours. Avoid if you have high blood pressure. May cause drowsiness.",
+        "Seniors 65+ years: 1 tablet every 6 hours. Maximum: 3 tablets in 24 hours. Use with caution if you have heart disease or hypertension. Consult your doctor."
+    )
+)
+
+# Fast path: exact generic names resolve with a single dict lookup
+_DOSAGE_EXACT = {
+    'paracetamol': _PARACETAMOL_DOSAGE,
+    'ibuprofen': _IBUPROFEN_DOSAGE,
+}
+
+# Fallback predicates for combination/partial generic names, checked in
+# order (the ibuprofen+paracetamol combo must come before plain
+# substring rules, matching the original elif ordering)
+_DOSAGE_RULES = (
+    (lambda g: 'ibuprofen' in g and 'paracetamol' in g,
+     _IBUPROFEN_PARACETAMOL_DOSAGE),
+    (lambda g: 'cetirizine' in g, _CETIRIZINE_DOSAGE),
+    (lambda g: 'sodium ascorbate' in g or 'ascorbic acid' in g,
+     _VITAMIN_C_DOSAGE),
+    (lambda g: 'aluminum hydroxide' in g or 'magnesium hydroxide' in g,
+     _ANTACID_DOSAGE),
+    (lambda g: 'loperamide' in g, _LOPERAMIDE_DOSAGE),
+    (lambda g: 'multivitamin' in g or 'vitamin b-complex' in g,
+     _MULTIVITAMIN_DOSAGE),
+    (lambda g: 'phenylephrine' in g, _PHENYLEPHRINE_DOSAGE),
+)
+
+
 def calculate_personalized_dosage(generic_name, age):
     """
-    Calculate personalized dosage based on age using decision tree logic
+    Calculate personalized dosage based on age using the compiled
+    dosage rule tables above
 
     Args:
         generic_name: Generic name of the medicine (e.g., 'Paracetamol')
@@ -106,136 +341,183 @@ def calculate_personalized_dosage(generic_name, age):
     """
     generic_lower = generic_name.lower()
 
-    # Decision tree for Paracetamol dosage based on age
-    if generic_lower == 'paracetamol':
-        if age < 2:
-            return (
-                "⚠️ CONSULT A DOCTOR: For infants under 2 years, "
-                "paracetamol dosage must be determined by a healthcare professional "
-                "based on weight and specific medical condition. Do not self-medicate."
-            )
-        elif age < 6:
-            return (
-                "Children 2-5 years: Typically 120-240 mg (liquid formulation recommended). "
-                "Dosage should be based on body weight (10-15 mg/kg every 4-6 hours). "
-                "Maximum 4 doses in 24 hours. Please consult a pediatrician for exact dosing."
-            )
-        elif age < 12:
-            return (
-                "Children 6-11 years: Typically 240-480 mg every 4-6 hours. "
-                "For 500mg tablets: ½ to 1 tablet every 4-6 hours. "
-                "Do not exceed 2,400 mg (approximately 5 tablets of 500mg) in 24 hours. "
-                "Consult a healthcare provider if symptoms persist."
-            )
-        elif age < 18:
-            return (
-                "Adolescents 12-17 years: 1 to 2 tablets of 500mg every 4-6 hours as needed. "
-                "Maximum dose: 4,000 mg (8 tablets of 500mg) in 24 hours. "
-                "Maintain at least 4 hours between doses. Take with food if stomach upset occurs."
-            )
-        elif age < 65:
-            return (
-                "Adults 18-64 years: 1 to 2 tablets of 500mg every 4-6 hours as needed for pain or fever. "
-                "Maximum dose: 4,000 mg (8 tablets of 500mg) in 24 hours. "
-                "Do not take more than recommended. Can be taken with or without food."
-            )
-        else:
-            return (
-                "Seniors 65+ years: 1 to 2 tablets of 500mg every 4-6 hours. "
-                "Maximum dose: 3,000 mg (6 tablets of 500mg) in 24 hours recommended for elderly. "
-                "Start with lower dose if you have liver or kidney issues. "
-                "Consult your doctor, especially if taking other medications."
-            )
-
-    # Ibuprofen + Paracetamol (Alaxan FR)
-    elif 'ibuprofen' in generic_lower and 'paracetamol' in generic_lower:
-        if age < 12:
-            return "⚠️ NOT RECOMMENDED for children under 12 years. Consult a physician for appropriate dosage."
-        elif age < 18:
-            return "Adolescents 12-17 years: 1 capsule every 6-8 hours as needed. Do not exceed 6 capsules in 24 hours."
-        elif age < 65:
-            return "Adults 18-64 years: 1-2 capsules every 6-8 hours as needed. Maximum: 6 capsules in 24 hours. Take with food to reduce stomach irritation."
-        else:
-            return "Seniors 65+ years: Start with 1 capsule every 6-8 hours. Maximum: 4 capsules in 24 hours. Use with caution if you have kidney issues."
-
-    # Ibuprofen (Advil)
-    elif generic_lower == 'ibuprofen':
-        if age < 12:
-            return "⚠️ NOT RECOMMENDED in this tablet form for children under 12 years. Use pediatric suspension or consult a doctor."
-        elif age < 18:
-            return "Adolescents 12-17 years: 1-2 tablets (200 mg each) every 4-6 hours as needed. Maximum: 1,200 mg (6 tablets) in 24 hours."
-        elif age < 65:
-            return "Adults 18-64 years: 1-2 tablets (200 mg each) every 4-6 hours as needed. Maximum: 1,200 mg (6 tablets) in 24 hours for OTC use."
-        else:
-            return "Seniors 65+ years: Start with 1 tablet every 4-6 hours. Use lowest effective dose. Consult doctor if you have heart, kidney, or stomach issues."
-
-    # Cetirizine (antihistamine)
-    elif 'cetirizine' in generic_lower:
-        if age < 12:
-            return "⚠️ Children under 12 years: Dosage must be determined by a healthcare professional based on age and weight."
-        elif age < 65:
-            return "Adults & Children 12+ years: 1 tablet (10 mg) once daily. Take with or without food. May cause mild drowsiness."
-        else:
-            return "Seniors 65+ years: 1 tablet (10 mg) once daily. Use with caution if you have kidney problems; dose adjustment may be needed. Consult your doctor."
-
-    # Sodium Ascorbate / Vitamin C (Fern-C)
-    elif 'sodium ascorbate' in generic_lower or 'ascorbic acid' in generic_lower:
-        if age < 12:
-            return "Children under 12 years: Consult a pediatrician for appropriate Vitamin C dosage based on age and dietary needs."
-        elif age < 18:
-            return "Adolescents 12-17 years: 1 capsule (500 mg) daily. May be increased to 3-4 capsules during illness as advised by healthcare provider."
-        elif age < 65:
-            return "Adults 18-64 years: 1 capsule (500 mg) daily for maintenance. May increase to 3-4 capsules during illness or stress. Take with food if stomach upset occurs."
-        else:
-            return "Seniors 65+ years: 1 capsule (500 mg) daily. Safe for long-term use. Non-acidic formulation is gentle on the stomach."
-
-    # Antacid (Kremil-S)
-    elif 'aluminum hydroxide' in generic_lower or 'magnesium hydroxide' in generic_lower:
-        if age < 12:
-            return "⚠️ NOT RECOMMENDED for children. Consult a pediatrician for appropriate antacid treatment."
-        elif age < 65:
-            return "Adults 12-64 years: Chew 1-2 tablets one hour after each meal and at bedtime. Maximum: 8 tablets per day. Do not use long-term without medical advice."
-        else:
-            return "Seniors 65+ years: Chew 1 tablet after meals and at bedtime. Use with caution if you have kidney problems. Consult your doctor for long-term use."
-
-    # Loperamide (Diatabs - antidiarrheal)
-    elif 'loperamide' in generic_lower:
-        if age < 12:
-            return "⚠️ NOT RECOMMENDED for children under 12 years. Use pediatric formulations or consult a doctor."
-        elif age < 65:
-            return "Adults & Children 12+ years: Take 2 capsules initially, then 1 capsule after each loose stool. Maximum: 8 capsules (16 mg) per day. Ensure adequate hydration with ORS."
-        else:
-            return "Seniors 65+ years: Take 2 capsules initially, then 1 after each loose stool. Maximum: 6 capsules per day. Stop if no improvement after 2 days and consult doctor. Maintain hydration."
-
-    # Multivitamins (Enervon)
-    elif 'multivitamin' in generic_lower or 'vitamin b-complex' in generic_lower:
-        if age < 12:
-            return "⚠️ This adult formulation is not recommended for children under 12 years. Use pediatric multivitamin formulations."
-        elif age < 65:
-            return "Adults & Adolescents 12+ years: 1 tablet daily with or without food. Best taken at the same time each day for consistent nutrient levels."
-        else:
-            return "Seniors 65+ years: 1 tablet daily. Safe for long-term use. Consult your doctor if taking other medications to avoid interactions."
-
-    # Phenylephrine combination (Bioflu - flu medication)
-    elif 'phenylephrine' in generic_lower:
-        if age < 12:
-            return "⚠️ NOT RECOMMENDED for children under 12 years. Use pediatric Bioflu syrup with appropriate dosing for age/weight."
-        elif age < 65:
-            return "Adults & Children 12+ years: 1 tablet every 6 hours. Do NOT exceed 4 tablets in 24 hours. Avoid if you have high blood pressure. May cause drowsiness."
-        else:
-            return "Seniors 65+ years: 1 tablet every 6 hours. Maximum: 3 tablets in 24 hours. Use with caution if you have heart disease or hypertension. Consult your doctor."
+    rule = _DOSAGE_EXACT.get(generic_lower)
+    if rule is None:
+        for matcher, bands in _DOSAGE_RULES:
+            if matcher(generic_lower):
+                rule = bands
+                break
 
-    else:
+    if rule is None:
         return (
             f"Age-based dosage for {generic_name} is not available in our system. "
             "Please consult the medicine packaging or a healthcare professional."
         )
 
+    age_edges, messages = rule
+    return messages[bisect.bisect_right(age_edges, age)]
+
+
+# C-level key function for picking the highest-confidence detection
+_CONFIDENCE = itemgetter('confidence')
+
+
+def _dumps_bytes(obj):
+    """Serialize to compact JSON bytes (orjson when available)"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+
+# The "no detections" payload is constant — serialize it once at import
+# and return the same bytes on every such request
+_NO_DETECTION_BYTES = _dumps_bytes({
+    'medicine': 'No Medicine Detected',
+    'usage': 'No medicine was detected in the image. '
+             'Please try again with a clearer image.',
+    'sideEffects': 'N/A',
+    'misconceptions': 'Ensure the medicine packaging is clearly '
+                      'visible and well-lit for better detection '
+                      'accuracy.'
+})
+
+# Pre-serialized 400 payloads for the validation checks in predict()
+_INVALID_REQUEST_BYTES = _dumps_bytes({
+    'error': 'Invalid request. Missing detections data.'
+})
+_INVALID_DETECTIONS_BYTES = _dumps_bytes({
+    'error': 'Invalid request. detections must be a list.'
+})
+_INVALID_AGE_BYTES = _dumps_bytes({
+    'error': 'Invalid request. age must be a number.'
+})
+
+# Template for detections that are not in the database; only the
+# per-request fields are filled in on a copy
+_UNKNOWN_MEDICINE_BASE = {
+    'medicine': None,
+    'usage': 'Information not available for this medicine. '
+             'Please consult a healthcare professional or pharmacist.',
+    'sideEffects': 'Please refer to the medicine packaging or '
+                   'consult a healthcare professional.',
+    'misconceptions': 'Always read medicine labels carefully and '
+                      'follow prescribed dosages.'
+}
+
+# Response timestamp cached at second granularity. The timestamp in
+# /api/predict responses is informational only, so formatting is
+# amortized across all requests within the same second.
+_TS_CACHE = [0, '']
+
+
+def _iso_now():
+    """Return the current UTC time in ISO format, cached per second"""
+    ts = int(time.time())
+    if ts != _TS_CACHE[0]:
+        _TS_CACHE[0] = ts
+        _TS_CACHE[1] = time.strftime(
+            '%Y-%m-%dT%H:%M:%SZ', time.gmtime(ts))
+    return _TS_CACHE[1]
+
+
+def _row_to_medicine_info(row):
+    """Build the medicine info dictionary from a pills table row"""
+    return {
+        'id': row['ID'],
+        'name': f"{row['Brand_Name']} ({row['Generic_Name']})",
+        'pillLabel': row['Pill_Label'],
+        'genericName': row['Generic_Name'],
+        'brandName': row['Brand_Name'],
+        'manufacturer': row['Manufacturer'],
+        'medicalUse': row['Medical_Use'],
+        'dosageGuidelines': row['Dosage_Guidelines'],
+        'warnings': row['Warnings'],
+        'additionalInfo': row['Additional_Info'],
+        'prescriptionRequired': bool(row['Prescription_Req']),
+        'legalStatus': row['Legal_Status']
+    }
+
+
+def load_pills_cache():
+    """
+    Load the full pills table into memory
+
+    Reads every row once and rebuilds the lookup dicts and the list
+    served by /api/medicines, so read endpoints become O(1) dict
+    lookups with no per-request SQL. Call again (e.g. via
+    /api/admin/reload) after update_database.py changes the table.
+    """
+    conn = get_db_connection()
+    rows = conn.execute("SELECT * FROM pills").fetchall()
+
+    by_label = {}
+    by_id = {}
+    medicines = []
+    for row in rows:
+        info = _row_to_medicine_info(row)
+        by_label[info['pillLabel']] = info
+        by_id[info['id']] = info
+        medicines.append({
+            'id': info['id'],
+            'pillLabel': info['pillLabel'],
+            'brandName': info['brandName'],
+            'genericName': info['genericName'],
+            'displayName': info['name']
+        })
+
+    # Update in place so module-level references stay valid
+    PILLS_BY_LABEL.clear()
+    PILLS_BY_LABEL.update(by_label)
+    PILLS_BY_ID.clear()
+    PILLS_BY_ID.update(by_id)
+    MEDICINES_LIST[:] = medicines
+
+    # Serialize the medicines list once; /api/medicines just returns
+    # these bytes (with an ETag so unchanged clients get a 304)
+    global MEDICINES_JSON_BYTES, MEDICINES_ETAG
+    if orjson is not None:
+        MEDICINES_JSON_BYTES = orjson.dumps(medicines)
+    else:
+        MEDICINES_JSON_BYTES = json.dumps(
+            medicines, separators=(',', ':')).encode('utf-8')
+    MEDICINES_ETAG = hashlib.blake2b(MEDICINES_JSON_BYTES).hexdigest()[:16]
+
+    # Fuse YOLO class -> medicine info and pre-assemble the static part
+    # of each /api/predict response
+    class_to_info = {
+        key: by_label[label]
+        for key, label in CLASS_TO_DB_LABEL.items()
+        if label in by_label
+    }
+    class_to_base = {}
+    for key, info in class_to_info.items():
+        image_filename = CLASS_TO_IMAGE.get(key)
+        class_to_base[key] = {
+            'medicine': info['name'],
+            'pillLabel': info['pillLabel'],
+            'genericName': info['genericName'],
+            'brandName': info['brandName'],
+            'manufacturer': info['manufacturer'],
+            'usage': info['medicalUse'],
+            'dosage': info['dosageGuidelines'],
+            'personalizedDosage': None,
+            'userAge': None,
+            'sideEffects': info['warnings'],
+            'misconceptions': info['additionalInfo'],
+            'prescriptionRequired': info['prescriptionRequired'],
+            'legalStatus': info['legalStatus'],
+            'imageUrl': (f'/static/images/medicines/{image_filename}'
+                         if image_filename else None)
+        }
+    CLASS_TO_MEDICINE_INFO.clear()
+    CLASS_TO_MEDICINE_INFO.update(class_to_info)
+    CLASS_TO_BASE_RESPONSE.clear()
+    CLASS_TO_BASE_RESPONSE.update(class_to_base)
+
 
 def get_medicine_info(pill_label):
     """
-    Fetch medicine information from database by Pill_Label
-    Uses in-memory cache to avoid repeated database queries
+    Look up medicine information by Pill_Label from the in-memory cache
 
     Args:
         pill_label: The pill label from database (e.g., 'Biogesic 500mg')
@@ -243,66 +525,79 @@ def get_medicine_info(pill_label):
     Returns:
         Dictionary with medicine information or None if not found
     """
-    # Check cache first
-    if pill_label in MEDICINE_CACHE:
-        return MEDICINE_CACHE[pill_label]
+    return PILLS_BY_LABEL.get(pill_label)
 
-    # Not in cache, query database
-    conn = get_db_connection()
-    cursor = conn.cursor()
 
-    cursor.execute(
-        "SELECT * FROM pills WHERE Pill_Label = ?",
-        (pill_label,)
-    )
+# Load the pills table into memory at startup
+load_pills_cache()
 
-    row = cursor.fetchone()
-    conn.close()
+# The pages take no dynamic context, so render each Jinja template once
+# at startup and serve the cached bytes (Flask-Compress still handles
+# on-the-fly compression for them)
+with app.test_request_context():
+    _RENDERED_PAGES = {
+        name: render_template(f'{name}.html').encode('utf-8')
+        for name in ('index', 'scan', 'about', 'results')
+    }
 
-    if row:
-        medicine_info = {
-            'id': row['ID'],
-            'name': f"{row['Brand_Name']} ({row['Generic_Name']})",
-            'pillLabel': row['Pill_Label'],
-            'genericName': row['Generic_Name'],
-            'brandName': row['Brand_Name'],
-            'manufacturer': row['Manufacturer'],
-            'medicalUse': row['Medical_Use'],
-            'dosageGuidelines': row['Dosage_Guidelines'],
-            'warnings': row['Warnings'],
-            'additionalInfo': row['Additional_Info'],
-            'prescriptionRequired': bool(row['Prescription_Req']),
-            'legalStatus': row['Legal_Status']
-        }
-        # Cache the result
-        MEDICINE_CACHE[pill_label] = medicine_info
-        return medicine_info
 
-    return None
+def _render_cached(name):
+    """Serve a page pre-rendered at startup"""
+    return Response(_RENDERED_PAGES[name], mimetype='text/html')
 
 
 @app.route('/')
 def index():
     """Render home page"""
-    return render_template('index.html')
+    return _render_cached('index')
 
 
 @app.route('/scan')
 def scan():
     """Render scan page"""
-    return render_template('scan.html')
+    return _render_cached('scan')
 
 
 @app.route('/about')
 def about():
     """Render about page"""
-    return render_template('about.html')
+    return _render_cached('about')
 
 
 @app.route('/results')
 def results():
     """Render results page"""
-    return render_template('results.html')
+    return _render_cached('results')
+
+
+def _serve_static_precompressed(filename):
+    """
+    Serve /static files, preferring a precompressed .br sibling
+
+    When <file>.br exists (built at deploy time with
+    brotli -q 11 static/*.bin) and the client accepts brotli, its bytes
+    are sent directly with Content-Encoding: br, skipping runtime
+    compression. Files without a precompressed sibling fall through to
+    Flask's normal static handling, where Flask-Compress still
+    compresses them per request.
+    """
+    if 'br' in request.headers.get('Accept-Encoding', ''):
+        br_path = os.path.join(app.static_folder, filename + '.br')
+        if os.path.isfile(br_path):
+            response = send_from_directory(
+                app.static_folder,
+                filename + '.br',
+                mimetype=(mimetypes.guess_type(filename)[0]
+                          or 'application/octet-stream')
+            )
+            response.headers['Content-Encoding'] = 'br'
+            response.headers['Vary'] = 'Accept-Encoding'
+            return response
+    return app.send_static_file(filename)
+
+
+# Replace the default static view so precompressed artifacts are used
+app.view_functions['static'] = _serve_static_precompressed
 
 
 @app.route('/api/predict', methods=['POST'])
@@ -324,92 +619,79 @@ def predict():
         "timestamp": "2025-11-14T10:30:00.000Z"
     }
     """
+    # Validate the payload shape up front: each failure returns a
+    # precomputed 400 without involving the exception machinery, so the
+    # success path below runs straight-line
+    data = request.get_json(silent=True)
+
+    if not isinstance(data, dict) or 'detections' not in data:
+        return Response(
+            _INVALID_REQUEST_BYTES, status=400, mimetype='application/json')
+
+    detections = data['detections']
+    if not isinstance(detections, list):
+        return Response(
+            _INVALID_DETECTIONS_BYTES, status=400,
+            mimetype='application/json')
+
+    user_age = data.get('age')
+    if user_age is not None and not isinstance(user_age, (int, float)):
+        return Response(
+            _INVALID_AGE_BYTES, status=400, mimetype='application/json')
+
+    # If no detections found, return the pre-serialized payload
+    if len(detections) == 0:
+        return Response(_NO_DETECTION_BYTES, mimetype='application/json')
+
     try:
-        data = request.get_json()
-
-        if not data or 'detections' not in data:
-            return jsonify({
-                'error': 'Invalid request. Missing detections data.'
-            }), 400
-
-        detections = data.get('detections', [])
-        user_age = data.get('age')
-
-        # If no detections found
-        if len(detections) == 0:
-            return jsonify({
-                'medicine': 'No Medicine Detected',
-                'usage': 'No medicine was detected in the image. '
-                         'Please try again with a clearer image.',
-                'sideEffects': 'N/A',
-                'misconceptions': 'Ensure the medicine packaging is clearly '
-                                  'visible and well-lit for better detection '
-                                  'accuracy.'
-            })
-
-        # Get the detection with highest confidence
-        primary_detection = max(
-            detections, key=lambda x: x.get('confidence', 0))
-        medicine_key = primary_detection.get('medicine', '').lower()
-
-        # Map YOLO class label to database Pill_Label
-        pill_label = CLASS_TO_DB_LABEL.get(medicine_key)
-
-        # Get image filename for this medicine
-        image_filename = CLASS_TO_IMAGE.get(medicine_key)
-        image_url = f'/static/images/medicines/{image_filename}' if image_filename else None
-
-        if pill_label:
-            # Fetch medicine info from database
-            medicine_info = get_medicine_info(pill_label)
-
-            if medicine_info:
-                # Calculate personalized dosage if age is provided
-                personalized_dosage = None
-                if user_age is not None:
-                    personalized_dosage = calculate_personalized_dosage(
-                        medicine_info['genericName'],
-                        user_age
-                    )
-
-                response = {
-                    'medicine': medicine_info['name'],
-                    'pillLabel': medicine_info['pillLabel'],
-                    'genericName': medicine_info['genericName'],
-                    'brandName': medicine_info['brandName'],
-                    'manufacturer': medicine_info['manufacturer'],
-                    'usage': medicine_info['medicalUse'],
-                    'dosage': medicine_info['dosageGuidelines'],
-                    'personalizedDosage': personalized_dosage,
-                    'userAge': user_age,
-                    'sideEffects': medicine_info['warnings'],
-                    'misconceptions': medicine_info['additionalInfo'],
-                    'prescriptionRequired': medicine_info['prescriptionRequired'],
-                    'legalStatus': medicine_info['legalStatus'],
-                    'confidence': primary_detection.get('confidence', 0),
-                    'detectionCount': len(detections),
-                    'imageUrl': image_url,
-                    'timestamp': datetime.now().isoformat()
-                }
-                return jsonify(response)
+        # Get the detection with highest confidence; a single detection
+        # (the common case) skips the scan entirely
+        if len(detections) == 1:
+            primary_detection = detections[0]
+        else:
+            try:
+                primary_detection = max(detections, key=_CONFIDENCE)
+            except KeyError:
+                # Defensive fallback for detections missing 'confidence'
+                primary_detection = max(
+                    detections, key=lambda x: x.get('confidence', 0))
+        # YOLO class names arrive as canonical lowercase, so the common
+        # case needs no .lower() allocation; fall back to lowercasing
+        # only for keys that miss the lookup table
+        medicine_key = primary_detection.get('medicine') or ''
+        if medicine_key not in CLASS_TO_BASE_RESPONSE:
+            medicine_key = medicine_key.lower()
+
+        # Pre-assembled response template for known classes
+        base_response = CLASS_TO_BASE_RESPONSE.get(medicine_key)
+
+        if base_response is not None:
+            response = base_response.copy()
+
+            # Calculate personalized dosage if age is provided
+            if user_age is not None:
+                response['personalizedDosage'] = calculate_personalized_dosage(
+                    response['genericName'],
+                    user_age
+                )
+                response['userAge'] = user_age
+
+            response['confidence'] = primary_detection.get('confidence', 0)
+            response['detectionCount'] = len(detections)
+            response['timestamp'] = _iso_now()
+            return jsonify(response)
 
         # Unknown medicine detected or not in database
-        response = {
-            'medicine': f'Detected: {medicine_key}',
-            'usage': 'Information not available for this medicine. '
-                     'Please consult a healthcare professional or pharmacist.',
-            'sideEffects': 'Please refer to the medicine packaging or '
-                           'consult a healthcare professional.',
-            'misconceptions': 'Always read medicine labels carefully and '
-                              'follow prescribed dosages.',
-            'confidence': primary_detection.get('confidence', 0),
-            'detectionCount': len(detections),
-            'timestamp': datetime.now().isoformat()
-        }
+        response = _UNKNOWN_MEDICINE_BASE.copy()
+        response['medicine'] = f'Detected: {medicine_key}'
+        response['confidence'] = primary_detection.get('confidence', 0)
+        response['detectionCount'] = len(detections)
+        response['timestamp'] = _iso_now()
 
         return jsonify(response)
 
-    except (ValueError, KeyError, TypeError) as e:
+    except Exception as e:
+        # Genuinely unexpected input (e.g. malformed detection entries)
         app.logger.error('Error in /api/predict: %s', str(e))
         return jsonify({
             'error': 'An error occurred while processing the request.',
@@ -421,26 +703,16 @@ def predict():
 def get_medicines():
     """
     Get list of all medicines in the database
+    (served from the pre-serialized payload built at startup)
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
-
-    cursor.execute(
-        "SELECT ID, Pill_Label, Brand_Name, Generic_Name FROM pills")
-    rows = cursor.fetchall()
-    conn.close()
-
-    medicines = []
-    for row in rows:
-        medicines.append({
-            'id': row['ID'],
-            'pillLabel': row['Pill_Label'],
-            'brandName': row['Brand_Name'],
-            'genericName': row['Generic_Name'],
-            'displayName': f"{row['Brand_Name']} ({row['Generic_Name']})"
-        })
+    if request.headers.get('If-None-Match') == MEDICINES_ETAG:
+        return Response(status=304, headers={'ETag': MEDICINES_ETAG})
 
-    return jsonify(medicines)
+    return Response(
+        MEDICINES_JSON_BYTES,
+        mimetype='application/json',
+        headers={'ETag': MEDICINES_ETAG}
+    )
 
 
 @app.route('/api/medicine/<int:medicine_id>', methods=['GET'])
@@ -448,34 +720,29 @@ def get_medicine_by_id(medicine_id):
     """
     Get detailed information about a specific medicine by ID
     """
-    conn = get_db_connection()
-    cursor = conn.cursor()
+    medicine_info = PILLS_BY_ID.get(medicine_id)
 
-    cursor.execute("SELECT * FROM pills WHERE ID = ?", (medicine_id,))
-    row = cursor.fetchone()
-    conn.close()
-
-    if row:
-        return jsonify({
-            'id': row['ID'],
-            'name': f"{row['Brand_Name']} ({row['Generic_Name']})",
-            'pillLabel': row['Pill_Label'],
-            'genericName': row['Generic_Name'],
-            'brandName': row['Brand_Name'],
-            'manufacturer': row['Manufacturer'],
-            'medicalUse': row['Medical_Use'],
-            'dosageGuidelines': row['Dosage_Guidelines'],
-            'warnings': row['Warnings'],
-            'additionalInfo': row['Additional_Info'],
-            'prescriptionRequired': bool(row['Prescription_Req']),
-            'legalStatus': row['Legal_Status']
-        })
+    if medicine_info:
+        return jsonify(medicine_info)
 
     return jsonify({
         'error': 'Medicine not found'
     }), 404
 
 
+@app.route('/api/admin/reload', methods=['POST'])
+def reload_medicines():
+    """
+    Reload the in-memory medicine cache from the database
+    (call after running update_database.py)
+    """
+    load_pills_cache()
+    return jsonify({
+        'status': 'ok',
+        'medicines': len(MEDICINES_LIST)
+    })
+
+
 if __name__ == '__main__':
     # For development only - use a proper WSGI server for production
     # Railway (and other cloud platforms) provide PORT via environment variable
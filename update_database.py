@@ -4,54 +4,52 @@ Script to update the database with all medicines from pills.csv
 """
 
 import sqlite3
-import csv
 import os
 
+try:
+    import pandas as pd
+except ImportError:
+    print("Error: pandas is required for this script. Run: pip install pandas")
+    exit(1)
+
 # Paths
 DB_PATH = 'assets/mediweb.db'
-CSV_PATH = 'assets/pills.csv'
+CSV_PATH = 'assets/Pills.csv'
 
 def update_database():
     """Import all medicines from CSV to database"""
 
     # Connect to database
     conn = sqlite3.connect(DB_PATH)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
     cursor = conn.cursor()
 
-    # Clear existing data
-    cursor.execute("DELETE FROM pills")
-    print("Cleared existing medicines from database")
-
-    # Read CSV and insert data (with BOM handling)
-    with open(CSV_PATH, 'r', encoding='utf-8-sig') as csvfile:
-        csv_reader = csv.DictReader(csvfile)
-
-        medicines_added = 0
-        for row in csv_reader:
-            cursor.execute("""
-                INSERT INTO pills (
-                    ID, Pill_Label, Generic_Name, Brand_Name, Manufacturer,
-                    Medical_Use, Dosage_Guidelines, Warnings, Additional_Info,
-                    Prescription_Req, Legal_Status
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                row['ID'],
-                row['Pill_Label'],
-                row['Generic_Name'],
-                row['Brand_Name'],
-                row['Manufacturer'],
-                row['Medical_Use'],
-                row['Dosage_Guidelines'],
-                row['Warnings'],
-                row['Additional_Info'],
-                row['Prescription_Req'],
-                row['Legal_Status']
-            ))
-            medicines_added += 1
-            print(f"Added: {row['Pill_Label']}")
-
-    # Commit changes
-    conn.commit()
+    # Parse the CSV in C via pandas (encoding handles the BOM) and cast
+    # the integer columns so they land with integer affinity instead of
+    # the strings a plain csv read produces
+    df = pd.read_csv(CSV_PATH, encoding='utf-8-sig')
+    df['ID'] = df['ID'].astype(int)
+    df['Prescription_Req'] = df['Prescription_Req'].astype(int)
+
+    # Replace the table contents with batched inserts in as few
+    # transactions as possible instead of one commit per row
+    with conn:
+        cursor.execute("DELETE FROM pills")
+        df.to_sql('pills', conn, if_exists='append', index=False,
+                  method='multi', chunksize=500)
+
+        # Keep lookup indexes in place on fresh imports and refresh the
+        # planner statistics for them
+        cursor.execute(
+            'CREATE UNIQUE INDEX IF NOT EXISTS idx_pills_label '
+            'ON pills(Pill_Label)')
+        cursor.execute(
+            'CREATE UNIQUE INDEX IF NOT EXISTS idx_pills_id ON pills(ID)')
+
+    conn.execute('ANALYZE')
+
+    medicines_added = len(df)
 
     # Verify
     cursor.execute("SELECT COUNT(*) FROM pills")